@@ -0,0 +1,187 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import cv2
+from profiler import Profiler
+from video_processor import VideoProcessor
+from video_source_interface import LocalFileSource
+
+# Headless benchmark of the detection pipeline. Runs VideoProcessor over the
+# sample clips and ObjectDetector over the validation images, then reports
+# per-stage latency percentiles, fps, peak RSS and model load time. Use
+# --output to save the report as JSON and --compare to diff it against an
+# earlier report; the exit code is 1 when something regressed.
+
+def find_default_weights():
+    candidates = glob.glob("runs/detect/*/weights/best.pt") + glob.glob("runs/detect/*/weights/last.pt")
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, KiB elsewhere
+        return round(peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024, 1)
+    except ImportError:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / 1024 ** 2, 1)
+
+def benchmark_video(detector, video_path, args):
+    profiler = Profiler()
+    output_dir = tempfile.mkdtemp()
+    output_path = os.path.join(output_dir, "benchmark.mp4") if args.encode else None
+
+    start = time.perf_counter()
+    processor = VideoProcessor(LocalFileSource(video_path))
+    frame_count = processor.process_video(detector, output_path, display=False, pipelined=args.pipelined,
+                                          batch_size=args.batch_size, detect_every=args.detect_every,
+                                          profiler=profiler)
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        "frames": frame_count,
+        "seconds": round(elapsed, 3),
+        "fps": round(frame_count / elapsed, 2) if elapsed else 0.0,
+        "stages": profiler.summary(),
+    }
+
+def benchmark_images(detector, image_dir, batch_size):
+    profiler = Profiler()
+    image_paths = sorted(glob.glob(os.path.join(image_dir, "*.jpg")) + glob.glob(os.path.join(image_dir, "*.png")))
+
+    # No VideoProcessor here to lend the detector the profiler, so do it for
+    # the length of the loop
+    previous_profiler, detector.profiler = detector.profiler, profiler
+    start = time.perf_counter()
+    try:
+        for i in range(0, len(image_paths), batch_size):
+            images = []
+            for path in image_paths[i:i + batch_size]:
+                with profiler.stage("decode"):
+                    images.append(cv2.imread(path))
+            detector.get_detections_batch(images, annotate=False)
+    finally:
+        detector.profiler = previous_profiler
+    elapsed = time.perf_counter() - start
+
+    return {
+        "frames": len(image_paths),
+        "seconds": round(elapsed, 3),
+        "fps": round(len(image_paths) / elapsed, 2) if elapsed else 0.0,
+        "stages": profiler.summary(),
+    }
+
+def print_run(name, run):
+    print(f"\n[INFO] {name}: {run['frames']} frames in {run['seconds']} s ({run['fps']} fps)")
+    print(f"{'stage':<12} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'total s':>9}")
+    for stage, s in run["stages"].items():
+        print(f"{stage:<12} {s['count']:>7} {s['p50_ms']:>9.2f} {s['p90_ms']:>9.2f} {s['p99_ms']:>9.2f} "
+              f"{s['total_s']:>9.2f}")
+
+def compare(report, baseline, tolerance):
+    # fps may not drop, and stage p50 latencies may not rise, by more than tolerance
+    regressions = []
+    for name, run in report["runs"].items():
+        old = baseline.get("runs", {}).get(name)
+        if old is None:
+            continue
+        if old["fps"] and run["fps"] < old["fps"] * (1 - tolerance):
+            regressions.append(f"{name}: fps {old['fps']} -> {run['fps']}")
+        for stage, s in run["stages"].items():
+            old_stage = old["stages"].get(stage)
+            if old_stage and old_stage["p50_ms"] and s["p50_ms"] > old_stage["p50_ms"] * (1 + tolerance):
+                regressions.append(f"{name}/{stage}: p50 {old_stage['p50_ms']} ms -> {s['p50_ms']} ms")
+
+    old_load = baseline.get("startup", {}).get("model_load_s")
+    if old_load and report["startup"]["model_load_s"] > old_load * (1 + tolerance):
+        regressions.append(f"model load {old_load} s -> {report['startup']['model_load_s']} s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection pipeline benchmark")
+    parser.add_argument("--weights", default=find_default_weights(),
+                        help="defaults to the newest runs/detect/*/weights checkpoint")
+    parser.add_argument("--videos", nargs="*", default=sorted(glob.glob("temp/*.mp4")))
+    parser.add_argument("--images", default="valid/images")
+    parser.add_argument("--device", default=None, help="e.g. cpu or cuda:0; auto-detected when omitted")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--detect-every", type=int, default=1)
+    parser.add_argument("--pipelined", action="store_true")
+    parser.add_argument("--no-encode", dest="encode", action="store_false",
+                        help="skip writing the annotated output video")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if not args.weights:
+        print("[ERROR] No checkpoint found under runs/detect/*/weights, pass --weights")
+        sys.exit(2)
+
+    # Imported here so the (torch/ultralytics dominated) import cost is measured
+    start = time.perf_counter()
+    from object_detector import ObjectDetector
+    import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    detector = ObjectDetector(args.weights, verbose=False, device=args.device)
+    load_seconds = time.perf_counter() - start
+
+    report = {
+        "config": {
+            "weights": args.weights,
+            "device": args.device or "auto",
+            "batch_size": args.batch_size,
+            "detect_every": args.detect_every,
+            "pipelined": args.pipelined,
+            "encode": args.encode,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "startup": {
+            "import_s": round(import_seconds, 3),
+            "model_load_s": round(load_seconds, 3),
+        },
+        "runs": {},
+    }
+
+    for video_path in args.videos:
+        report["runs"][video_path] = benchmark_video(detector, video_path, args)
+        print_run(video_path, report["runs"][video_path])
+    if args.images and os.path.isdir(args.images):
+        report["runs"][args.images] = benchmark_images(detector, args.images, args.batch_size)
+        print_run(args.images, report["runs"][args.images])
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    print(f"\n[INFO] import {report['startup']['import_s']} s, model load {report['startup']['model_load_s']} s, "
+          f"peak RSS {report['peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("batch_size") != args.batch_size or \
+                baseline.get("config", {}).get("pipelined") != args.pipelined:
+            print("[INFO] Baseline used a different batch size or pipeline mode; per-call latencies differ")
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"[REGRESSION] {regression}")
+        if regressions:
+            sys.exit(1)
+        print("[INFO] No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
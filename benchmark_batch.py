@@ -0,0 +1,55 @@
+import argparse
+import glob
+import time
+import cv2
+from object_detector import ObjectDetector
+
+# Compares detector throughput at different batch sizes on the sample clips.
+# Frames are decoded up front so only inference + post-processing is timed.
+
+def load_frames(video_paths, max_frames):
+    frames = []
+    for path in video_paths:
+        cap = cv2.VideoCapture(path)
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    return frames
+
+def benchmark(detector, frames, batch_size):
+    # Warm-up pass so model fusing and allocator growth are not timed
+    detector.get_detections_batch(frames[:batch_size], annotate=False)
+
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        detector.get_detections_batch(frames[i:i + batch_size], annotate=False)
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched inference benchmark")
+    parser.add_argument("--weights", default="runs/detect/train11/weights/best.pt")
+    parser.add_argument("--videos", nargs="+", default=sorted(glob.glob("temp/*.mp4")))
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8, 16])
+    parser.add_argument("--max-frames", type=int, default=256)
+    args = parser.parse_args()
+
+    frames = load_frames(args.videos, args.max_frames)
+    if not frames:
+        print("[ERROR] No frames could be read from the given videos")
+        return
+    print(f"[INFO] Loaded {len(frames)} frames from {len(args.videos)} video(s)")
+
+    detector = ObjectDetector(args.weights, verbose=False)
+    baseline = None
+    print(f"{'batch':>6} {'frames/sec':>12} {'speedup':>9}")
+    for batch_size in args.batch_sizes:
+        fps = benchmark(detector, frames, batch_size)
+        baseline = baseline or fps
+        print(f"{batch_size:>6} {fps:>12.2f} {fps / baseline:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
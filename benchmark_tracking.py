@@ -0,0 +1,115 @@
+import argparse
+import glob
+import os
+import time
+import cv2
+import numpy as np
+import yaml
+from scipy.optimize import linear_sum_assignment
+from object_detector import ObjectDetector
+from video_processor import VideoProcessor
+from video_source_interface import LocalFileSource
+from deepsort.sort import Sort, iou_matrix
+
+# Accuracy/throughput of "detect every Nth frame, track in between".
+#  - valid/images: detector precision/recall against the ground-truth labels
+#  - sample videos: fps for each N, plus how well the tracked boxes agree
+#    with running the detector on every frame, and how many track ids appear
+
+IOU_MATCH = 0.5
+
+def count_matches(pred_xywh, pred_labels, true_xywh, true_labels):
+    if not len(pred_xywh) or not len(true_xywh):
+        return 0
+    iou = iou_matrix(pred_xywh, true_xywh)
+    iou[pred_labels[:, None] != true_labels[None, :]] = 0.0
+    rows, cols = linear_sum_assignment(-iou)
+    return int((iou[rows, cols] >= IOU_MATCH).sum())
+
+def precision_recall(matched, predicted, expected):
+    precision = matched / predicted if predicted else 1.0
+    recall = matched / expected if expected else 1.0
+    return precision, recall
+
+def load_labels(label_path, names, width, height):
+    if not os.path.isfile(label_path):
+        return np.zeros((0, 4)), np.zeros(0, dtype=object)
+    rows = np.loadtxt(label_path, ndmin=2)
+    if not len(rows):
+        return np.zeros((0, 4)), np.zeros(0, dtype=object)
+    xywh = rows[:, 1:5] * [width, height, width, height]
+    labels = np.array([names[int(c)] for c in rows[:, 0]], dtype=object)
+    return xywh, labels
+
+def benchmark_images(detector, image_dir, label_dir, names):
+    image_paths = sorted(glob.glob(os.path.join(image_dir, "*.jpg")))
+    matched = predicted = expected = 0
+    elapsed = 0.0
+    for path in image_paths:
+        image = cv2.imread(path)
+        start = time.perf_counter()
+        _, detections = detector.get_detection(image, annotate=False)
+        elapsed += time.perf_counter() - start
+
+        stem = os.path.splitext(os.path.basename(path))[0]
+        height, width = image.shape[:2]
+        true_xywh, true_labels = load_labels(os.path.join(label_dir, stem + ".txt"), names, width, height)
+        matched += count_matches(detections.xywh, detections.labels, true_xywh, true_labels)
+        predicted += len(detections)
+        expected += len(true_xywh)
+
+    precision, recall = precision_recall(matched, predicted, expected)
+    fps = len(image_paths) / elapsed if elapsed else 0.0
+    print(f"[INFO] {len(image_paths)} images: precision {precision:.3f}, recall {recall:.3f}, {fps:.2f} images/sec")
+
+def run_video(detector, video_path, detect_every, batch_size):
+    processor = VideoProcessor(LocalFileSource(video_path))
+    start = time.perf_counter()
+    frames = [detections for _, detections, _ in processor.iter_detections(
+        detector, None, display=False, batch_size=batch_size,
+        tracker=Sort(max_age=max(5, 2 * detect_every)), detect_every=detect_every)]
+    elapsed = time.perf_counter() - start
+    return frames, elapsed
+
+def benchmark_video(detector, video_path, intervals, batch_size):
+    print(f"[INFO] {video_path}")
+    print(f"{'N':>4} {'fps':>8} {'precision':>10} {'recall':>8} {'track ids':>10}")
+    reference = None
+    for detect_every in intervals:
+        frames, elapsed = run_video(detector, video_path, detect_every, batch_size)
+        if reference is None:
+            reference = frames
+
+        matched = predicted = expected = 0
+        for tracked, full in zip(frames, reference):
+            matched += count_matches(tracked.xywh, tracked.labels, full.xywh, full.labels)
+            predicted += len(tracked)
+            expected += len(full)
+        precision, recall = precision_recall(matched, predicted, expected)
+        all_ids = np.concatenate([f.track_id for f in frames]) if frames else np.zeros(0)
+        track_ids = len(np.unique(all_ids[all_ids >= 0]))
+        fps = len(frames) / elapsed if elapsed else 0.0
+        print(f"{detect_every:>4} {fps:>8.2f} {precision:>10.3f} {recall:>8.3f} {track_ids:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracker accuracy/throughput benchmark")
+    parser.add_argument("--weights", default="runs/detect/train11/weights/best.pt")
+    parser.add_argument("--data", default="data.yaml")
+    parser.add_argument("--images", default="valid/images")
+    parser.add_argument("--labels", default="valid/labels")
+    parser.add_argument("--videos", nargs="+", default=sorted(glob.glob("temp/*.mp4")))
+    parser.add_argument("--intervals", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    with open(args.data) as f:
+        names = yaml.safe_load(f)["names"]
+
+    detector = ObjectDetector(args.weights, verbose=False)
+    benchmark_images(detector, args.images, args.labels, names)
+    for video_path in args.videos:
+        # N=1 runs first and is the reference the other intervals are scored against
+        benchmark_video(detector, video_path, sorted(set([1] + args.intervals)), args.batch_size)
+
+if __name__ == "__main__":
+    main()
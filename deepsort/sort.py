@@ -0,0 +1,176 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from detections import Detections
+
+# ----------SORT multi-object tracker-----------
+# Bewley et al., "Simple Online and Realtime Tracking". Every track is a
+# constant-velocity Kalman filter over [cx, cy, area, aspect, vcx, vcy, varea];
+# all tracks are stored in stacked arrays so predict/update run as a handful
+# of batched matrix operations instead of a Python loop per track.
+
+STATE_DIM = 7
+MEASUREMENT_DIM = 4
+
+F = np.eye(STATE_DIM)
+F[0, 4] = F[1, 5] = F[2, 6] = 1.0
+
+H = np.eye(MEASUREMENT_DIM, STATE_DIM)
+
+Q = np.eye(STATE_DIM)
+Q[4:, 4:] *= 0.01
+Q[-1, -1] *= 0.01
+
+R = np.eye(MEASUREMENT_DIM)
+R[2:, 2:] *= 10.0
+
+INITIAL_P = np.eye(STATE_DIM) * 10.0
+INITIAL_P[4:, 4:] *= 1000.0  # velocities are unobserved at birth
+
+
+def xywh_to_z(xywh):
+    w, h = xywh[:, 2], xywh[:, 3]
+    return np.stack([xywh[:, 0], xywh[:, 1], w * h, w / np.maximum(h, 1e-6)], axis=1)
+
+
+def x_to_xywh(x):
+    area = np.maximum(x[:, 2], 1e-6)
+    w = np.sqrt(area * np.maximum(x[:, 3], 1e-6))
+    return np.stack([x[:, 0], x[:, 1], w, area / w], axis=1)
+
+
+def iou_matrix(xywh_a, xywh_b):
+    a = np.concatenate([xywh_a[:, :2] - xywh_a[:, 2:] / 2, xywh_a[:, :2] + xywh_a[:, 2:] / 2], axis=1)
+    b = np.concatenate([xywh_b[:, :2] - xywh_b[:, 2:] / 2, xywh_b[:, :2] + xywh_b[:, 2:] / 2], axis=1)
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class Sort:
+
+    def __init__(self, max_age=5, min_hits=1, iou_threshold=0.3):
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.names = {}
+        self.next_id = 0
+        self.x = np.zeros((0, STATE_DIM))
+        self.P = np.zeros((0, STATE_DIM, STATE_DIM))
+        self.track_id = np.zeros(0, dtype=np.int32)
+        self.class_id = np.zeros(0, dtype=np.int32)
+        self.confidence = np.zeros(0, dtype=np.float32)
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.time_since_update = np.zeros(0, dtype=np.int32)
+        # Tracks matched (or started) by the most recent update(); only these
+        # are reported on skipped frames, the rest wait for re-association
+        self.matched = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.track_id)
+
+    def predict(self):
+        # Tracks seen at the last detector pass, moved on one frame, for
+        # frames the detector skipped
+        self.advance()
+        return self.current_detections()
+
+    def advance(self):
+        if len(self):
+            # Keep the predicted area positive
+            shrinking = self.x[:, 2] + self.x[:, 6] <= 0
+            self.x[shrinking, 6] = 0.0
+            self.x = self.x @ F.T
+            self.P = F @ self.P @ F.T + Q
+        self.time_since_update += 1
+        self.remove_stale_tracks()
+
+    def update(self, detections):
+        # Associate a fresh detector pass with the tracks and return the same
+        # detections with their track ids filled in.
+        self.names = detections.names
+        self.advance()
+
+        z = xywh_to_z(detections.xywh)
+        matches, unmatched = self.associate(detections)
+        self.matched[:] = False
+
+        if len(matches):
+            tracks, dets = matches[:, 0], matches[:, 1]
+            self.correct(tracks, z[dets])
+            self.class_id[tracks] = detections.class_id[dets]
+            self.confidence[tracks] = detections.confidence[dets]
+            self.hits[tracks] += 1
+            self.time_since_update[tracks] = 0
+            self.matched[tracks] = True
+
+        track_id = np.full(len(detections), -1, dtype=np.int32)
+        if len(matches):
+            track_id[matches[:, 1]] = self.track_id[matches[:, 0]]
+        track_id[unmatched] = self.start_tracks(z[unmatched], detections.class_id[unmatched],
+                                                detections.confidence[unmatched])
+
+        # Tentative tracks keep their id internally but are not reported yet
+        confirmed = self.hits[self.index_of(track_id)] >= self.min_hits
+        track_id[~confirmed] = -1
+        return Detections(detections.xywh, detections.confidence, detections.class_id,
+                          detections.names, track_id)
+
+    def associate(self, detections):
+        if not len(self) or not len(detections):
+            return np.zeros((0, 2), dtype=int), np.arange(len(detections))
+
+        iou = iou_matrix(x_to_xywh(self.x), detections.xywh)
+        # Never match across classes
+        iou[self.class_id[:, None] != detections.class_id[None, :]] = 0.0
+        rows, cols = linear_sum_assignment(-iou)
+        keep = iou[rows, cols] >= self.iou_threshold
+        matches = np.stack([rows[keep], cols[keep]], axis=1)
+        unmatched = np.setdiff1d(np.arange(len(detections)), matches[:, 1])
+        return matches, unmatched
+
+    def correct(self, tracks, z):
+        x, P = self.x[tracks], self.P[tracks]
+        PHt = P @ H.T
+        S = H @ PHt + R
+        K = PHt @ np.linalg.inv(S)
+        residual = z - x @ H.T
+        self.x[tracks] = x + np.einsum("nij,nj->ni", K, residual)
+        self.P[tracks] = (np.eye(STATE_DIM) - K @ H) @ P
+
+    def start_tracks(self, z, class_id, confidence):
+        count = len(z)
+        new_ids = np.arange(self.next_id, self.next_id + count, dtype=np.int32)
+        self.next_id += count
+
+        x = np.zeros((count, STATE_DIM))
+        x[:, :MEASUREMENT_DIM] = z
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, np.repeat(INITIAL_P[None], count, axis=0)])
+        self.track_id = np.concatenate([self.track_id, new_ids])
+        self.class_id = np.concatenate([self.class_id, class_id.astype(np.int32)])
+        self.confidence = np.concatenate([self.confidence, confidence.astype(np.float32)])
+        self.hits = np.concatenate([self.hits, np.ones(count, dtype=np.int32)])
+        self.time_since_update = np.concatenate([self.time_since_update, np.zeros(count, dtype=np.int32)])
+        self.matched = np.concatenate([self.matched, np.ones(count, dtype=bool)])
+        return new_ids
+
+    def index_of(self, track_id):
+        # Track ids are issued in increasing order, so the array stays sorted
+        return np.searchsorted(self.track_id, track_id)
+
+    def remove_stale_tracks(self):
+        alive = self.time_since_update <= self.max_age
+        if alive.all():
+            return
+        self.x, self.P = self.x[alive], self.P[alive]
+        self.track_id, self.class_id = self.track_id[alive], self.class_id[alive]
+        self.confidence, self.hits = self.confidence[alive], self.hits[alive]
+        self.time_since_update, self.matched = self.time_since_update[alive], self.matched[alive]
+
+    def current_detections(self):
+        confirmed = (self.hits >= self.min_hits) & self.matched
+        return Detections(x_to_xywh(self.x[confirmed]), self.confidence[confirmed],
+                          self.class_id[confirmed], self.names, self.track_id[confirmed])
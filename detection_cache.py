@@ -0,0 +1,151 @@
+from detections import Detections
+from video_cache import file_sha256
+import hashlib
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+import uuid
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "object_detection_detection_cache")
+
+# ----------Persistent detection cache-----------
+# Raw detector output for a whole video, keyed by the video bytes, the model
+# weights and the inference settings. Each entry is a directory of columnar
+# .npy files: every detector call's boxes are concatenated into xywh /
+# confidence / class_id, and offsets[i]:offsets[i + 1] selects call i. The
+# arrays are memory-mapped on load, so replay touches only the frames it reads.
+# meta.json records how many video frames the run covered, which lets a
+# headless replay skip decoding the video entirely.
+
+class DetectionCache:
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key_for(video_path, detector, detect_every=1):
+        identity = {
+            "video": file_sha256(video_path),
+            "weights": file_sha256(detector.model_path),
+            "settings": detector.settings(),
+            "detect_every": detect_every,
+        }
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        path = self.entry_path(key)
+        if not os.path.isdir(path):
+            return None
+        return CachedDetections(path)
+
+    def recorder(self, key):
+        return DetectionRecorder(self.entry_path(key))
+
+
+class CachedDetections:
+
+    def __init__(self, path):
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.xywh = np.load(os.path.join(path, "xywh.npy"), mmap_mode="r")
+        self.confidence = np.load(os.path.join(path, "confidence.npy"), mmap_mode="r")
+        self.class_id = np.load(os.path.join(path, "class_id.npy"), mmap_mode="r")
+        with open(os.path.join(path, "names.json")) as f:
+            self.names = {int(cls_id): label for cls_id, label in json.load(f).items()}
+        self.frame_count = None
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.isfile(meta_path):
+            with open(meta_path) as f:
+                self.frame_count = json.load(f).get("frame_count")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return Detections(self.xywh[start:end], self.confidence[start:end], self.class_id[start:end], self.names)
+
+
+class DetectionRecorder:
+
+    def __init__(self, path):
+        self.path = path
+        self.counts = []
+        self.xywh = []
+        self.confidence = []
+        self.class_id = []
+        self.names = {}
+
+    def add(self, detections):
+        self.counts.append(len(detections))
+        self.xywh.append(detections.xywh)
+        self.confidence.append(detections.confidence)
+        self.class_id.append(detections.class_id)
+        self.names = detections.names
+
+    def commit(self, frame_count=None):
+        # Write next to the final location and rename, so a crash never
+        # leaves a half-written entry that later runs would replay
+        temp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(temp_path)
+        offsets = np.concatenate([[0], np.cumsum(self.counts, dtype=np.int64)])
+        np.save(os.path.join(temp_path, "offsets.npy"), offsets)
+        np.save(os.path.join(temp_path, "xywh.npy"), np.concatenate(self.xywh or [np.zeros((0, 4), np.float32)]))
+        np.save(os.path.join(temp_path, "confidence.npy"), np.concatenate(self.confidence or [np.zeros(0, np.float32)]))
+        np.save(os.path.join(temp_path, "class_id.npy"), np.concatenate(self.class_id or [np.zeros(0, np.int32)]))
+        names = self.names if isinstance(self.names, dict) else dict(enumerate(self.names))
+        with open(os.path.join(temp_path, "names.json"), "w") as f:
+            json.dump({str(cls_id): label for cls_id, label in names.items()}, f)
+        with open(os.path.join(temp_path, "meta.json"), "w") as f:
+            json.dump({"frame_count": frame_count}, f)
+
+        if os.path.isdir(self.path):
+            shutil.rmtree(temp_path)
+        else:
+            os.replace(temp_path, self.path)
+        print(f"[INFO] Cached {len(self.counts)} detector passes over {frame_count} frames")
+
+
+class CachedDetector:
+    # Drop-in for ObjectDetector inside VideoProcessor. With a cache hit it
+    # hands back stored results in call order and never runs the model; on a
+    # miss it runs the real detector and records what it returned.
+
+    def __init__(self, detector, cached=None, recorder=None):
+        self.detector = detector
+        self.cached = cached
+        self.recorder = recorder
+        self.position = 0
+
+    @property
+    def profiler(self):
+        return self.detector.profiler
+
+    @profiler.setter
+    def profiler(self, profiler):
+        self.detector.profiler = profiler
+
+    def get_detection(self, frame, annotate=True):
+        return self.get_detections_batch([frame], annotate)[0]
+
+    def get_detections_batch(self, frames, annotate=True):
+        frames = list(frames)
+        if self.cached is not None:
+            if self.position + len(frames) > len(self.cached):
+                raise RuntimeError("Cached detections do not cover this video")
+            detections = [self.cached[self.position + i] for i in range(len(frames))]
+            self.position += len(frames)
+        else:
+            detections = [d for _, d in self.detector.get_detections_batch(frames, annotate=False)]
+            if self.recorder is not None:
+                for d in detections:
+                    self.recorder.add(d)
+        return [(self.annotate(frame, d) if annotate else None, d) for frame, d in zip(frames, detections)]
+
+    def annotate(self, frame, detections):
+        return self.detector.annotate(frame, detections)
@@ -0,0 +1,78 @@
+import numpy as np
+
+# ----------Columnar detection results-----------
+# One row per box: xywh (center x, center y, width, height in pixels),
+# confidence, class_id and track_id (-1 when untracked) live in parallel
+# NumPy arrays so a whole frame is filtered, measured or serialised without
+# touching individual boxes.
+class Detections:
+
+    def __init__(self, xywh, confidence, class_id, names, track_id=None):
+        self.xywh = np.asarray(xywh, dtype=np.float32).reshape(-1, 4)
+        self.confidence = np.asarray(confidence, dtype=np.float32).reshape(-1)
+        self.class_id = np.asarray(class_id, dtype=np.int32).reshape(-1)
+        if track_id is None:
+            track_id = np.full(len(self.class_id), -1)
+        self.track_id = np.asarray(track_id, dtype=np.int32).reshape(-1)
+        self.names = names
+        self.label_table = self.build_label_table(names)
+
+    @staticmethod
+    def build_label_table(names):
+        if isinstance(names, dict):
+            table = np.empty(max(names, default=-1) + 1, dtype=object)
+            for cls_id, label in names.items():
+                table[cls_id] = label
+            return table
+        return np.asarray(list(names), dtype=object)
+
+    @classmethod
+    def empty(cls, names):
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0), names)
+
+    @classmethod
+    def from_result(cls, result):
+        # boxes.data is [x1, y1, x2, y2, conf, cls]; one device -> host copy per frame
+        data = result.boxes.data.cpu().numpy()
+        x1, y1, x2, y2 = data[:, 0], data[:, 1], data[:, 2], data[:, 3]
+        xywh = np.stack([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], axis=1)
+        return cls(xywh, data[:, 4], data[:, 5], result.names)
+
+    def __len__(self):
+        return len(self.class_id)
+
+    def __getitem__(self, index):
+        return Detections(self.xywh[index], self.confidence[index], self.class_id[index],
+                          self.names, self.track_id[index])
+
+    @property
+    def labels(self):
+        return self.label_table[self.class_id]
+
+    @property
+    def centers(self):
+        return self.xywh[:, :2]
+
+    @property
+    def xyxy(self):
+        half = self.xywh[:, 2:] / 2
+        return np.concatenate([self.xywh[:, :2] - half, self.xywh[:, :2] + half], axis=1)
+
+    def class_ids_for(self, labels):
+        return [cls_id for cls_id, label in enumerate(self.label_table) if label in labels]
+
+    def label_mask(self, labels):
+        return np.isin(self.class_id, self.class_ids_for(labels))
+
+    def to_dicts(self):
+        dicts = []
+        for label, conf, box, track_id in zip(self.labels, self.confidence, self.xywh, self.track_id):
+            detection = {
+                "label": label,
+                "confidence": round(float(conf), 2),
+                "box": [round(float(x), 2) for x in box]
+            }
+            if track_id >= 0:
+                detection["track_id"] = int(track_id)
+            dicts.append(detection)
+        return dicts
@@ -1,40 +1,83 @@
-import math
+from collections import deque
 import cv2
+import numpy as np
+
+class PairDistances:
+    # Row k measures detections[first[k]] -> detections[second[k]];
+    # distance_mm is NaN until the pixel/mm ratio has been calibrated.
+    def __init__(self, detections, first, second, pixel_distance, distance_mm):
+        self.detections = detections
+        self.first = np.asarray(first, dtype=np.int32)
+        self.second = np.asarray(second, dtype=np.int32)
+        self.pixel_distance = np.asarray(pixel_distance, dtype=np.float32)
+        self.distance_mm = np.asarray(distance_mm, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.first)
+
+    def to_dicts(self):
+        labels, track_id = self.detections.labels, self.detections.track_id
+        return [
+            {
+                "labels": [labels[a], labels[b]],
+                "track_ids": [int(track_id[a]), int(track_id[b])],
+                "distance_mm": None if np.isnan(mm) else round(float(mm), 2)
+            }
+            for a, b, mm in zip(self.first, self.second, self.distance_mm)
+        ]
 
 class DistanceCalculator:
-    def __init__(self, reference_label="scale", reference_mm=300):
+    def __init__(self, reference_label="scale", reference_mm=300, target_labels=("Bottle", "Book"),
+                 calibration_window=30, smoothing=0.2):
         self.reference_label = reference_label
         self.reference_mm = reference_mm
+        self.target_labels = list(target_labels)
+        # pixel/mm is the median of the last calibration_window scale sightings,
+        # then exponentially smoothed so one bad box can't make it jump
+        self.smoothing = smoothing
+        self.samples = deque(maxlen=calibration_window)
         self.pixel_per_mm = None
 
     def update_pixel_mm_ratio(self, detections):
-        for detection in detections:
-            if detection["label"] == self.reference_label:
-                _, _, w, _ = detection["box"]
-                self.pixel_per_mm = w / self.reference_mm
-                return True
+        reference = detections.xywh[detections.label_mask([self.reference_label])]
+        if not len(reference):
+            return False
+        self.samples.extend(reference[:, 2] / self.reference_mm)
+        estimate = float(np.median(self.samples))
+        if self.pixel_per_mm is None:
+            self.pixel_per_mm = estimate
+        else:
+            self.pixel_per_mm += self.smoothing * (estimate - self.pixel_per_mm)
         return True
-    
-    def get_center(self, box):
-        x, y, _, _ = box
-        return int(x), int(y)
-    
-    def calculate_distance(self, box1, box2):
-        x1, y1 = self.get_center(box1)
-        x2, y2 = self.get_center(box2)
-        pixel_distance = math.hypot(x2-x1, y2-y1)
+
+    @staticmethod
+    def distance_matrix(centers):
+        delta = centers[:, None, :] - centers[None, :, :]
+        return np.hypot(delta[..., 0], delta[..., 1])
+
+    def measure(self, detections):
+        # Every unordered pair of target objects, from one pairwise matrix
+        targets = np.flatnonzero(detections.label_mask(self.target_labels))
+        matrix = self.distance_matrix(detections.centers[targets].astype(np.float64))
+        i, j = np.triu_indices(len(targets), k=1)
+        pixel_distance = matrix[i, j]
         if self.pixel_per_mm:
-            return round(pixel_distance * 1.0 / self.pixel_per_mm, 2), (x1, y1), (x2, y2)
+            distance_mm = pixel_distance / self.pixel_per_mm
         else:
-            return None, (x1, y1), (x2, y2)
-        
-    def annotate_distance(self, frame, box1, box2, label1, label2):
-        distance_mm, p1, p2 = self.calculate_distance(box1, box2)
-        if distance_mm is not None:
-            cv2.line(frame, p1, p2, (0, 0, 255), 2)
-            mid = (p1[0] + p2[0]) // 2, (p1[1] + p2[1]) // 2
-            cv2.putText(frame, f"{distance_mm} mm", mid, cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0,0,255), 2)
-            cv2.putText(frame, label1, p1, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 2)
-            cv2.putText(frame, label2, p2, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 2)
+            distance_mm = np.full(len(pixel_distance), np.nan)
+        return PairDistances(detections, targets[i], targets[j], pixel_distance, distance_mm)
 
+    def draw_pair(self, frame, p1, p2, distance_mm, label1, label2):
+        cv2.line(frame, p1, p2, (0, 0, 255), 2)
+        mid = (p1[0] + p2[0]) // 2, (p1[1] + p2[1]) // 2
+        cv2.putText(frame, f"{distance_mm} mm", mid, cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0,0,255), 2)
+        cv2.putText(frame, label1, p1, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 2)
+        cv2.putText(frame, label2, p2, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 2)
 
+    def annotate_distances(self, frame, distances):
+        centers = distances.detections.centers.astype(int).tolist()
+        labels = distances.detections.labels
+        for a, b, distance_mm in zip(distances.first, distances.second, distances.distance_mm):
+            if not np.isnan(distance_mm):
+                self.draw_pair(frame, tuple(centers[a]), tuple(centers[b]), round(float(distance_mm), 2),
+                               labels[a], labels[b])
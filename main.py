@@ -2,15 +2,22 @@ from video_source_interface import WebcamSource, LocalFileSource, YouTubeSource
 from object_detector import ObjectDetector
 from video_processor import VideoProcessor
 from distance_calculator import DistanceCalculator
+from results_sink import JSONLinesWriter
 
 # video_source = WebcamSource()
 video_source = LocalFileSource("temp/final_test_video.mp4")
 # youtube_url = "https://www.youtube.com/shorts/nLXBinY7BwI" 
-# video_source = YouTubeSource(youtube_url)
+# video_source = YouTubeSource(youtube_url, streaming=True)
 detector = ObjectDetector("runs/detect/train11/weights/best.pt")
 video_processor = VideoProcessor(video_source)
 output_path = "static/output.mp4"
 VideoProcessor.ensure_output_directory(output_path)
-detections = video_processor.process_video(detector, output_path, True)
+with JSONLinesWriter("static/detections.jsonl") as sink:
+    frame_count = video_processor.process_video(detector, output_path, True, sinks=[sink])
 
 
+
+# Several sources sharing one detector:
+# from multi_stream import MultiStreamRunner
+# runner = MultiStreamRunner(detector, [LocalFileSource("temp/scale025.mp4"), WebcamSource()], batch_size=8)
+# runner.run()
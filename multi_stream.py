@@ -0,0 +1,197 @@
+from video_source_interface import WebcamSource
+from deepsort.sort import Sort
+import cv2
+import queue
+import threading
+import time
+
+# ----------Multi-stream serving-----------
+# Every source is decoded on its own thread into a small per-stream queue.
+# A single scheduler thread owns the (shared) detector and builds each batch
+# round-robin across streams, one frame per stream per round, so a busy file
+# cannot starve a live camera. The model is loaded once however many streams
+# are attached.
+
+class StreamState:
+
+    def __init__(self, index, source, queue_size, drop_when_full, track):
+        self.index = index
+        self.source = source
+        self.frames = queue.Queue(maxsize=queue_size)
+        # Live sources drop their oldest frame to stay current; files block
+        self.drop_when_full = isinstance(source, WebcamSource) if drop_when_full is None else drop_when_full
+        self.tracker = Sort() if track else None
+        self.finished = False
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        # Set by MultiStreamRunner.run(); ended freezes fps once the stream is done
+        self.started = None
+        self.ended = None
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        end = self.ended if self.ended is not None else time.perf_counter()
+        return end - self.started
+
+    def stats(self):
+        elapsed = self.elapsed()
+        return {
+            "stream": self.index,
+            "fps": round(self.frames_processed / elapsed, 2) if elapsed > 0 else 0.0,
+            "queue_depth": self.frames.qsize(),
+            "read": self.frames_read,
+            "processed": self.frames_processed,
+            "dropped": self.frames_dropped,
+        }
+
+
+class MultiStreamRunner:
+
+    def __init__(self, detector, video_sources, batch_size=8, queue_size=4, drop_when_full=None,
+                 track=False, on_result=None, stats_interval=5.0):
+        self.detector = detector
+        self.batch_size = batch_size
+        self.on_result = on_result
+        self.stats_interval = stats_interval
+        self.streams = [StreamState(i, source, queue_size, drop_when_full, track)
+                        for i, source in enumerate(video_sources)]
+        self.stop_event = threading.Event()
+        self.frame_ready = threading.Event()
+        self.readers = []
+        self.next_stream = 0
+
+    def stats(self):
+        return [stream.stats() for stream in self.streams]
+
+    def print_stats(self):
+        for s in self.stats():
+            print(f"[INFO] stream {s['stream']}: {s['fps']} fps, queue {s['queue_depth']}, "
+                  f"processed {s['processed']}, dropped {s['dropped']}")
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        started = time.perf_counter()
+        for stream in self.streams:
+            stream.started = started
+            stream.ended = None
+        for stream in self.streams:
+            reader = threading.Thread(target=self.read_stream, args=(stream,), name=f"reader-{stream.index}",
+                                      daemon=True)
+            reader.start()
+            self.readers.append(reader)
+
+        last_report = time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                batch = self.next_batch()
+                if not batch:
+                    self.mark_ended()
+                    if all(stream.finished for stream in self.streams) and not self.pending():
+                        break
+                    self.frame_ready.wait(timeout=0.1)
+                    self.frame_ready.clear()
+                    continue
+
+                self.process_batch(batch)
+                self.mark_ended()
+
+                if self.stats_interval and time.perf_counter() - last_report >= self.stats_interval:
+                    self.print_stats()
+                    last_report = time.perf_counter()
+        except KeyboardInterrupt:
+            print("[INFO] Stopped by user.")
+        finally:
+            self.stop_event.set()
+            for reader in self.readers:
+                reader.join()
+            # Streams cut short by stop() end now
+            ended = time.perf_counter()
+            for stream in self.streams:
+                if stream.ended is None:
+                    stream.ended = ended
+
+        self.print_stats()
+        return self.stats()
+
+    def mark_ended(self):
+        # A stream is done once its reader hit the end and every frame it
+        # queued has been processed
+        now = time.perf_counter()
+        for stream in self.streams:
+            if stream.ended is None and stream.finished and stream.frames.empty():
+                stream.ended = now
+
+    def pending(self):
+        return any(not stream.frames.empty() for stream in self.streams)
+
+    def next_batch(self):
+        # Round-robin: one frame from each stream per round, starting after the
+        # stream that went first last time, until the batch is full.
+        batch = []
+        count = len(self.streams)
+        while len(batch) < self.batch_size:
+            took_any = False
+            for offset in range(count):
+                stream = self.streams[(self.next_stream + offset) % count]
+                try:
+                    frame_index, frame = stream.frames.get_nowait()
+                except queue.Empty:
+                    continue
+                batch.append((stream, frame_index, frame))
+                took_any = True
+                if len(batch) == self.batch_size:
+                    break
+            if not took_any:
+                break
+        self.next_stream = (self.next_stream + 1) % max(count, 1)
+        return batch
+
+    def process_batch(self, batch):
+        results = self.detector.get_detections_batch([frame for _, _, frame in batch], annotate=False)
+        for (stream, frame_index, frame), (_, detections) in zip(batch, results):
+            if stream.tracker is not None:
+                detections = stream.tracker.update(detections)
+            stream.frames_processed += 1
+            if self.on_result:
+                self.on_result(stream.index, frame_index, frame, detections)
+
+    def read_stream(self, stream):
+        cap = None
+        try:
+            source = stream.source.get_video_source()
+            cap = cv2.VideoCapture(source)
+            if not cap.isOpened():
+                print(f"[ERROR] Could not open video source: {source}")
+                return
+            while not self.stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                self.enqueue(stream, (stream.frames_read, frame))
+                stream.frames_read += 1
+        except Exception as e:
+            print(f"[ERROR] stream {stream.index} failed: {e}")
+        finally:
+            if cap is not None:
+                cap.release()
+            stream.finished = True
+            self.frame_ready.set()
+            stream.source.release()
+
+    def enqueue(self, stream, item):
+        while not self.stop_event.is_set():
+            try:
+                stream.frames.put(item, block=not stream.drop_when_full, timeout=0.1)
+                break
+            except queue.Full:
+                if stream.drop_when_full:
+                    try:
+                        stream.frames.get_nowait()
+                        stream.frames_dropped += 1
+                    except queue.Empty:
+                        pass
+        self.frame_ready.set()
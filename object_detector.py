@@ -1,42 +1,95 @@
 from ultralytics import YOLO
+from detections import Detections
+from profiler import NULL_PROFILER
 import cv2
+import numpy as np
 import torch
 import os
 import tempfile
 
+# BGR colours cycled by class id
+BOX_COLORS = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255),
+    (49, 210, 207), (10, 249, 72), (23, 204, 146), (134, 219, 61),
+]
+
 # ----------Object detection-----------
 class ObjectDetector:
 
-    def __init__(self, model_path):
+    def __init__(self, model_path, verbose=True, conf=0.25, imgsz=640, device=None, profiler=None):
 
+        self.model_path = model_path
         self.model = YOLO(model_path)
+        self.verbose = verbose
+        self.conf = conf
+        self.imgsz = imgsz
+        self.device = device
+        self.profiler = profiler or NULL_PROFILER
         self.setup_device()
 
+    def settings(self):
+        # Everything besides the weights that changes what the model returns
+        return {"conf": self.conf, "imgsz": self.imgsz}
+
     def setup_device(self):
-        if torch.cuda.is_available():
+        if self.device is not None:
+            self.model.to(self.device)
+            print(f"Running on {self.device}")
+        elif torch.cuda.is_available():
             self.model.to('cuda:0')
             print("Running on GPU")
         else:
             print("Running on CPU")
 
-    def get_detection(self, frame):
-        results = self.model(frame)[0]
-        annotated_frame = results.plot()
-        detections = []
+    def device_args(self):
+        # model.to() alone does not stick: each predict call picks its own
+        # device (cuda:0 whenever it exists) unless one is passed in
+        return {"device": self.device} if self.device is not None else {}
 
-        for box in results.boxes:
-            cls_id = int(box.cls[0].item())
-            label = results.names[cls_id]
-            conf = float(box.conf[0].item())
-            x_center, y_center, w, h = box.xywh[0].tolist()
-            x1 = int(x_center - w / 2)
-            y1 = int(y_center - h / 2)
+    def get_detection(self, frame, annotate=True):
+        return self.get_detections_batch([frame], annotate)[0]
 
-            coord_text = f"XYWH: {round(x_center)}, {round(y_center)}, {round(w)}, {round(h)}"
+    def get_detections_batch(self, frames, annotate=True):
+        # One forward pass over all frames; results come back in input order.
+        # With annotate=False no drawing happens and the frame slot is None.
+        frames = list(frames)
+        with self.profiler.stage("inference"):
+            results = self.model(frames, verbose=self.verbose, conf=self.conf, imgsz=self.imgsz, **self.device_args())
+        output = []
+        for frame, result in zip(frames, results):
+            with self.profiler.stage("postprocess"):
+                detections = Detections.from_result(result)
+            annotated_frame = None
+            if annotate:
+                with self.profiler.stage("annotate"):
+                    annotated_frame = self.annotate(frame, detections)
+            output.append((annotated_frame, detections))
+        return output
 
+    @staticmethod
+    def annotate(frame, detections):
+        # Draws in place on the frame and returns it
+        boxes = np.rint(detections.xyxy).astype(int)
+        centers = np.rint(detections.xywh).astype(int)
+        for (x1, y1, x2, y2), (xc, yc, w, h), label, conf, cls_id, track_id in zip(
+                boxes, centers, detections.labels, detections.confidence, detections.class_id,
+                detections.track_id):
+            color = BOX_COLORS[cls_id % len(BOX_COLORS)]
+            title = f"{label} {conf:.2f}" if track_id < 0 else f"#{track_id} {label} {conf:.2f}"
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
             cv2.putText(
-                annotated_frame,
-                coord_text,
+                frame,
+                title,
+                (x1, y1 - 35),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.75,
+                color,
+                2,
+                cv2.LINE_AA
+            )
+            cv2.putText(
+                frame,
+                f"XYWH: {xc}, {yc}, {w}, {h}",
                 (x1, y1 - 10),
                 cv2.FONT_HERSHEY_SIMPLEX,
                 0.75,
@@ -44,14 +97,7 @@ class ObjectDetector:
                 1,
                 cv2.LINE_AA
             )
-
-            detections.append({
-                "label": label,
-                "confidence": round(conf, 2),
-                "box": [round(x, 2) for x in [x_center, y_center, w, h]]
-            })
-
-        return annotated_frame, detections
+        return frame
 
 # ----------Video processing---------
 
@@ -0,0 +1,89 @@
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+import json
+import threading
+import time
+import numpy as np
+
+# ----------Stage profiling-----------
+# Components take an optional profiler and wrap each stage of their work in
+# `with profiler.stage("decode"):`. Stages used by the pipeline: decode,
+# inference, postprocess, track, annotate, measure and encode. Recording is
+# thread-safe so the pipelined stages can share one profiler, and hooks see
+# every timing as it happens, e.g. to export it while a stream is running.
+
+class Profiler:
+
+    def __init__(self, hooks=()):
+        self.samples = defaultdict(list)
+        self.hooks = list(hooks)
+        self.lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self.lock:
+            self.samples[name].append(seconds)
+        for hook in self.hooks:
+            hook(name, seconds)
+
+    def summary(self):
+        with self.lock:
+            samples = {name: np.asarray(values) * 1000.0 for name, values in self.samples.items()}
+        return {
+            name: {
+                "count": len(ms),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p90_ms": round(float(np.percentile(ms, 90)), 3),
+                "p99_ms": round(float(np.percentile(ms, 99)), 3),
+                "max_ms": round(float(ms.max()), 3),
+                "total_s": round(float(ms.sum()) / 1000.0, 3),
+            }
+            for name, ms in samples.items()
+        }
+
+    def print_summary(self):
+        print(f"{'stage':<12} {'count':>7} {'mean ms':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'total s':>9}")
+        for name, s in self.summary().items():
+            print(f"{name:<12} {s['count']:>7} {s['mean_ms']:>9.2f} {s['p50_ms']:>9.2f} {s['p90_ms']:>9.2f} "
+                  f"{s['p99_ms']:>9.2f} {s['total_s']:>9.2f}")
+
+
+class NullProfiler:
+    # Stand-in when profiling is off, so call sites need no checks
+
+    def stage(self, name):
+        return nullcontext()
+
+    def record(self, name, seconds):
+        pass
+
+NULL_PROFILER = NullProfiler()
+
+
+class TimingLogger:
+    # Profiler hook writing one JSON line per timing, flushed immediately
+    # so the file can be tailed during a run
+
+    def __init__(self, path):
+        self.file = open(path, "a")
+        self.lock = threading.Lock()
+
+    def __call__(self, name, seconds):
+        line = json.dumps({"time": round(time.time(), 3), "stage": name, "ms": round(seconds * 1000.0, 3)})
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,186 @@
+from detections import Detections
+from distance_calculator import PairDistances
+import io
+import json
+import numpy as np
+import os
+import struct
+import time
+
+# ----------Streaming result sinks-----------
+# VideoProcessor.process_video(sinks=[...]) calls
+# write(frame_index, detections, distances) once per frame as results come
+# out of the pipeline. Both writers flush as
+# they go, so another process can tail the file while the video is running.
+
+class JSONLinesWriter:
+    # One JSON object per frame:
+    # {"frame": 12, "detections": [{...}, ...], "distances": [{...}, ...]}
+
+    def __init__(self, path, flush_every=1):
+        self.path = path
+        self.flush_every = flush_every
+        self.pending = 0
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.file = open(path, "w")
+
+    def write(self, frame_index, detections, distances=None):
+        record = {"frame": frame_index, "detections": detections.to_dicts()}
+        if distances is not None:
+            record["distances"] = distances.to_dicts()
+        self.file.write(json.dumps(record) + "\n")
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.file.flush()
+            self.pending = 0
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Columnar file layout:
+#   MAGIC, then a header record holding the class names as JSON, then one
+#   record per chunk of frames. A record is an 8-byte little-endian length
+#   followed by that many bytes; chunk records are .npz archives with
+#   frame, offsets, xywh, confidence, class_id and track_id arrays, where
+#   offsets[i]:offsets[i + 1] are the boxes of frame[i], and the measured
+#   pairs in pair_offsets / pair_first / pair_second / distance_mm, with
+#   first and second indexing into that frame's boxes.
+MAGIC = b"DETCOL1\n"
+LENGTH = struct.Struct("<Q")
+
+class ColumnarWriter:
+
+    def __init__(self, path, chunk_frames=256):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.header_written = False
+        self.reset_chunk()
+
+    def reset_chunk(self):
+        self.frames = []
+        self.counts = []
+        self.xywh = []
+        self.confidence = []
+        self.class_id = []
+        self.track_id = []
+        self.pair_counts = []
+        self.pair_first = []
+        self.pair_second = []
+        self.distance_mm = []
+
+    def write(self, frame_index, detections, distances=None):
+        if not self.header_written:
+            names = detections.names if isinstance(detections.names, dict) else dict(enumerate(detections.names))
+            self.write_record(json.dumps({str(k): v for k, v in names.items()}).encode("utf-8"))
+            self.header_written = True
+
+        self.frames.append(frame_index)
+        self.counts.append(len(detections))
+        self.xywh.append(detections.xywh)
+        self.confidence.append(detections.confidence)
+        self.class_id.append(detections.class_id)
+        self.track_id.append(detections.track_id)
+        if distances is None:
+            distances = PairDistances(detections, [], [], [], [])
+        self.pair_counts.append(len(distances))
+        self.pair_first.append(distances.first)
+        self.pair_second.append(distances.second)
+        self.distance_mm.append(distances.distance_mm)
+        if len(self.frames) >= self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        if not self.frames:
+            return
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            frame=np.asarray(self.frames, dtype=np.int64),
+            offsets=np.concatenate([[0], np.cumsum(self.counts, dtype=np.int64)]),
+            xywh=np.concatenate(self.xywh),
+            confidence=np.concatenate(self.confidence),
+            class_id=np.concatenate(self.class_id),
+            track_id=np.concatenate(self.track_id),
+            pair_offsets=np.concatenate([[0], np.cumsum(self.pair_counts, dtype=np.int64)]),
+            pair_first=np.concatenate(self.pair_first),
+            pair_second=np.concatenate(self.pair_second),
+            distance_mm=np.concatenate(self.distance_mm),
+        )
+        self.write_record(buffer.getvalue())
+        self.reset_chunk()
+
+    def write_record(self, payload):
+        self.file.write(LENGTH.pack(len(payload)) + payload)
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_columnar(path, follow=False, poll_interval=0.5):
+    # Yields (frame_index, Detections, PairDistances). With follow=True it keeps waiting for
+    # new chunks like `tail -f`; stop iterating to end it.
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a columnar detections file")
+        names = None
+        while True:
+            payload = read_record(f)
+            if payload is None:
+                if not follow:
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            if names is None:
+                names = {int(k): v for k, v in json.loads(payload.decode("utf-8")).items()}
+                continue
+
+            with np.load(io.BytesIO(payload)) as chunk:
+                columns = {name: chunk[name] for name in chunk.files}
+            offsets, pair_offsets = columns["offsets"], columns["pair_offsets"]
+            for i, frame_index in enumerate(columns["frame"]):
+                start, end = offsets[i], offsets[i + 1]
+                detections = Detections(columns["xywh"][start:end], columns["confidence"][start:end],
+                                        columns["class_id"][start:end], names, columns["track_id"][start:end])
+                start, end = pair_offsets[i], pair_offsets[i + 1]
+                pair_first, pair_second = columns["pair_first"][start:end], columns["pair_second"][start:end]
+                centers = detections.centers
+                pixel_distance = np.hypot(*(centers[pair_first] - centers[pair_second]).T)
+                distances = PairDistances(detections, pair_first, pair_second, pixel_distance,
+                                          columns["distance_mm"][start:end])
+                yield int(frame_index), detections, distances
+
+
+def read_record(f):
+    # Returns None, and rewinds, when the record is not completely written yet
+    position = f.tell()
+    header = f.read(LENGTH.size)
+    if len(header) == LENGTH.size:
+        (size,) = LENGTH.unpack(header)
+        payload = f.read(size)
+        if len(payload) == size:
+            return payload
+    f.seek(position)
+    return None
@@ -0,0 +1,124 @@
+import functools
+import http.server
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.request
+from video_cache import VideoCache
+from video_source_interface import StreamingURLSource, YouTubeSource
+
+# Serves temp/ over a local http.server as a stand-in for a remote video URL
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp")
+SAMPLE_NAME = "scale025.mp4"
+
+class CountingHandler(http.server.SimpleHTTPRequestHandler):
+    requests = 0
+
+    def do_GET(self):
+        CountingHandler.requests += 1
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+class StreamingSourceTest(unittest.TestCase):
+
+    def setUp(self):
+        CountingHandler.requests = 0
+        handler = functools.partial(CountingHandler, directory=SAMPLE_DIR)
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/{SAMPLE_NAME}"
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = VideoCache(self.cache_dir)
+        with open(os.path.join(SAMPLE_DIR, SAMPLE_NAME), "rb") as f:
+            self.expected = f.read()
+        self.sources = []
+
+    def tearDown(self):
+        for source in self.sources:
+            source.release()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def streaming_source(self):
+        source = StreamingURLSource(self.url, self.cache)
+        self.sources.append(source)
+        return source
+
+    def read_url(self, url, start=None):
+        request = urllib.request.Request(url)
+        if start is not None:
+            request.add_header("Range", f"bytes={start}-")
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read()
+
+    def test_first_run_streams_and_fills_cache_with_one_download(self):
+        source = self.streaming_source()
+        relay_url = source.get_video_source()
+        self.assertTrue(relay_url.startswith("http://127.0.0.1:"))
+
+        status, data = self.read_url(relay_url)
+        source.wait_for_download()
+        self.assertEqual(status, 200)
+        self.assertEqual(data, self.expected)
+        self.assertEqual(CountingHandler.requests, 1)
+
+        cached_path = self.cache.lookup(source.cache_key)
+        self.assertIsNotNone(cached_path)
+        with open(cached_path, "rb") as f:
+            self.assertEqual(f.read(), self.expected)
+        self.assertFalse([name for name in os.listdir(self.cache_dir) if name.endswith(".part")])
+
+    def test_relay_serves_ranges(self):
+        source = self.streaming_source()
+        relay_url = source.get_video_source()
+        status, data = self.read_url(relay_url, start=1000)
+        source.wait_for_download()
+        self.assertEqual(status, 206)
+        self.assertEqual(data, self.expected[1000:])
+
+    def test_cache_fills_without_a_reader(self):
+        # wait_for_download() fills the cache even when nothing reads the relay
+        source = self.streaming_source()
+        source.get_video_source()
+        source.wait_for_download()
+        self.assertIsNotNone(self.cache.lookup(source.cache_key))
+
+    def test_second_run_uses_cache(self):
+        first = self.streaming_source()
+        first.get_video_source()
+        first.wait_for_download()
+
+        second = self.streaming_source()
+        self.assertEqual(second.get_video_source(), self.cache.lookup(first.cache_key))
+        self.assertEqual(CountingHandler.requests, 1)
+
+    def test_release_stops_the_relay(self):
+        source = self.streaming_source()
+        relay_url = source.get_video_source()
+        source.wait_for_download()
+        source.release()
+        with self.assertRaises(OSError):
+            self.read_url(relay_url)
+
+    def test_youtube_cache_hit_skips_resolve(self):
+        source = YouTubeSource("https://www.youtube.com/watch?v=example", streaming=True, cache=self.cache)
+        self.sources.append(source)
+        source.resolve = lambda: self.url
+        relay_url = source.get_video_source()
+        self.assertEqual(self.read_url(relay_url)[1], self.expected)
+        source.stream_source.wait_for_download()
+
+        again = YouTubeSource("https://www.youtube.com/watch?v=example", streaming=True, cache=self.cache)
+        again.resolve = lambda: self.fail("resolve() called on a cache hit")
+        self.assertEqual(again.get_video_source(), self.cache.lookup(source.cache_key()))
+        self.assertEqual(CountingHandler.requests, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
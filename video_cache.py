@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "object_detection_video_cache")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# Partial downloads older than this belong to a run that died mid-download
+STALE_PART_SECONDS = 24 * 60 * 60
+CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# ----------On-disk video cache-----------
+# Videos are stored once under the SHA-256 of their content; index.json maps
+# a source key (URL, YouTube id + format, ...) to that content hash, so two
+# URLs serving the same bytes share one file. Eviction is least-recently-used
+# by file mtime, which lookup() refreshes, until the cache fits max_bytes.
+
+class VideoCache:
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key_for(identity):
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def blob_path(self, content_hash):
+        return os.path.join(self.directory, content_hash + ".mp4")
+
+    def new_part_path(self):
+        return os.path.join(self.directory, f"{uuid.uuid4().hex}.part")
+
+    def load_index(self):
+        if not os.path.isfile(self.index_path):
+            return {}
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_index(self, index):
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(temp_path, self.index_path)
+
+    def lookup(self, key):
+        with self.lock:
+            content_hash = self.load_index().get(key)
+            if content_hash is None:
+                return None
+            path = self.blob_path(content_hash)
+            if not os.path.isfile(path):
+                return None
+            os.utime(path)
+            return path
+
+    def store(self, key, part_path):
+        content_hash = file_sha256(part_path)
+        with self.lock:
+            path = self.blob_path(content_hash)
+            if os.path.isfile(path):
+                os.remove(part_path)
+            else:
+                os.replace(part_path, path)
+            os.utime(path)
+
+            index = self.load_index()
+            index[key] = content_hash
+            self.evict(index, keep=path)
+            self.save_index(index)
+        return path
+
+    def evict(self, index, keep=None):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".part"):
+                if now - os.path.getmtime(path) > STALE_PART_SECONDS:
+                    os.remove(path)
+            elif name.endswith(".mp4"):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total -= size
+            print(f"[INFO] Evicted cached video {os.path.basename(path)}")
+
+        # Drop index entries whose content was evicted
+        for key in [k for k, h in index.items() if not os.path.isfile(self.blob_path(h))]:
+            del index[key]
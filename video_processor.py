@@ -1,16 +1,36 @@
 from distance_calculator import DistanceCalculator
+from video_source_interface import WebcamSource
+from deepsort.sort import Sort
+from detection_cache import CachedDetector
+from profiler import NULL_PROFILER
+from contextlib import closing
 import cv2
 import os
+import queue
+import threading
+
+# Marks the end of the frame stream between pipeline stages
+_END_OF_STREAM = object()
+
+# batch_size="auto": live sources favour latency, files favour throughput
+LIVE_BATCH_SIZE = 1
+FILE_BATCH_SIZE = 8
 
 class VideoProcessor:
 
     def __init__(self, video_source):
         self.video_source = video_source
+        self.source = None
+        self.interrupted = False
+        self.profiler = NULL_PROFILER
+        # Frames left to replay without decoding, or None to read the video
+        self.replay_frames = None
         self.cap = self.open_video_source()
         self.width, self.height, self.fps = self.get_video_properties()
 
     def open_video_source(self):
         source = self.video_source.get_video_source()
+        self.source = source
         cap = cv2.VideoCapture(source)
         if cap.isOpened():
             print("Video source opened successfully")
@@ -23,8 +43,8 @@ class VideoProcessor:
         height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         fps = self.cap.get(cv2.CAP_PROP_FPS)
         return width, height, fps
-    
-    
+
+
     @staticmethod
     def ensure_output_directory(path):
         folder = os.path.dirname(path)
@@ -34,53 +54,335 @@ class VideoProcessor:
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         out = cv2.VideoWriter(output_path, fourcc, self.fps, (self.width, self.height))
         return out
-    
-    def process_video(self, detector, output_path, display=True):
-        print("Processing frames....")
-        self.ensure_output_directory(output_path)
-        writer = self.setup_video_writer(output_path)
-        frame_count = 0
-        all_detections = []
-        
-        distance_calculator = DistanceCalculator(reference_label="scale", reference_mm=300)
 
-        while True:
-            ret, frame = self.cap.read()
+    def annotate_frame(self, detector, distance_calculator, frame, detections, annotate=True, calibrate=True):
+        # Drawing happens here, on the calling thread, never in the inference stage
+        annotated_frame = None
+        if annotate:
+            with self.profiler.stage("annotate"):
+                annotated_frame = detector.annotate(frame, detections)
+
+        with self.profiler.stage("measure"):
+            # Tracker-extrapolated boxes would only feed repeats of a
+            # predicted scale width into the calibration window
+            if calibrate:
+                distance_calculator.update_pixel_mm_ratio(detections)
+            distances = distance_calculator.measure(detections)
+
+            # Headless runs have nothing to draw on
+            if annotated_frame is not None:
+                distance_calculator.annotate_distances(annotated_frame, distances)
+        return annotated_frame, distances
+
+    def resolve_batch_size(self, batch_size):
+        if batch_size == "auto":
+            if isinstance(self.video_source, WebcamSource):
+                return LIVE_BATCH_SIZE
+            return FILE_BATCH_SIZE
+        return max(1, int(batch_size))
+
+    def read_frame(self):
+        if self.replay_frames is not None:
+            # Headless cache replay needs no pixels, only one slot per frame
+            if self.replay_frames <= 0:
+                return False, None
+            self.replay_frames -= 1
+            return True, None
+        with self.profiler.stage("decode"):
+            return self.cap.read()
+
+    def read_frames(self, count):
+        frames = []
+        while len(frames) < count:
+            ret, frame = self.read_frame()
             if not ret:
                 break
+            frames.append(frame)
+        return frames
 
-            # frame_count += 1
-            annotated_frame, detections = detector.get_detection(frame)
+    def detect_frames(self, detector, frames, frame_indices, tracker=None, detect_every=1):
+        # (detections, from_detector) per frame, from_detector being False for
+        # frames the tracker filled in. The caller draws them with annotate_frame
+        if tracker is None:
+            return [(detections, True) for _, detections in detector.get_detections_batch(frames, annotate=False)]
 
-            if distance_calculator.pixel_per_mm is None:
-                distance_calculator.update_pixel_mm_ratio(detections)
+        # Only every detect_every-th frame goes through the model; the tracker
+        # carries the boxes (and ids) across the frames in between.
+        keyframes = [i for i, frame_index in enumerate(frame_indices) if frame_index % detect_every == 0]
+        fresh = {}
+        if keyframes:
+            results = detector.get_detections_batch([frames[i] for i in keyframes], annotate=False)
+            fresh = {i: detections for i, (_, detections) in zip(keyframes, results)}
+
+        output = []
+        for i in range(len(frames)):
+            with self.profiler.stage("track"):
+                if i in fresh:
+                    output.append((tracker.update(fresh[i]), True))
+                else:
+                    output.append((tracker.predict(), False))
+        return output
 
-            target_boxes = [d for d in detections if d["label"] in ["Bottle", "Book"]]
-            if len(target_boxes) == 2:
-                box1 = target_boxes[0]["box"]
-                label1 = target_boxes[0]["label"]
-                box2 = target_boxes[1]["box"]
-                label2 = target_boxes[1]["label"]
-                distance_calculator.annotate_distance(annotated_frame, box1, box2, label1, label2)
+    def attach_detection_cache(self, detector, detection_cache, detect_every):
+        if not isinstance(self.source, str) or not os.path.isfile(self.source):
+            print("[INFO] Detection cache needs a local video file, running without it")
+            return detector, None
 
+        key = detection_cache.key_for(self.source, detector, detect_every)
+        cached = detection_cache.load(key)
+        if cached is not None:
+            print("[INFO] Replaying cached detections")
+            return CachedDetector(detector, cached=cached), None
+        recorder = detection_cache.recorder(key)
+        return CachedDetector(detector, recorder=recorder), recorder
 
+    @staticmethod
+    def show_frame(frame):
+        cv2.imshow("Live Detection", frame)
+        if cv2.waitKey(25) & 0xFF == ord('q'):
+            print("[INFO] Stream stopped by user.")
+            return False
+        return True
+
+    def process_video(self, detector, output_path=None, display=True, pipelined=False, queue_size=8, batch_size=1,
+                      tracker=None, detect_every=1, detection_cache=None, distance_calculator=None, sinks=(),
+                      profiler=None):
+        # Results are handed to each sink as they are produced and not kept,
+        # so memory stays flat however long the video is
+        frame_count = 0
+        results = self.iter_detections(detector, output_path, display, pipelined, queue_size, batch_size, tracker,
+                                       detect_every, detection_cache, distance_calculator, profiler)
+        # Closed explicitly so a failing sink stops the pipeline right away,
+        # not whenever the generator is garbage-collected
+        with closing(results):
+            for frame_index, detections, distances in results:
+                for sink in sinks:
+                    sink.write(frame_index, detections, distances)
+                frame_count += 1
+        return frame_count
+
+    def iter_detections(self, detector, output_path=None, display=True, pipelined=False, queue_size=8, batch_size=1,
+                        tracker=None, detect_every=1, detection_cache=None, distance_calculator=None, profiler=None):
+        print("Processing frames....")
+        self.profiler = profiler or NULL_PROFILER
+        writer = None
+        if output_path:
+            self.ensure_output_directory(output_path)
+            writer = self.setup_video_writer(output_path)
+        # Without a writer or a window nobody sees the frames, so skip drawing
+        annotate = writer is not None or display
+
+        if distance_calculator is None:
+            distance_calculator = DistanceCalculator(reference_label="scale", reference_mm=300)
+        batch_size = self.resolve_batch_size(batch_size)
+        if detect_every > 1 and tracker is None:
+            # Tracks must survive at least one full gap between detector passes
+            tracker = Sort(max_age=max(5, 2 * detect_every))
+        recorder = None
+        self.replay_frames = None
+        if detection_cache is not None:
+            detector, recorder = self.attach_detection_cache(detector, detection_cache, detect_every)
+            if recorder is None and isinstance(detector, CachedDetector) and not annotate:
+                self.replay_frames = detector.cached.frame_count
+        self.interrupted = False
+
+        if pipelined:
+            results = self.run_pipeline(detector, writer, distance_calculator, display, queue_size, batch_size,
+                                        annotate, tracker, detect_every)
+        else:
+            results = self.run_serial(detector, writer, distance_calculator, display, batch_size, annotate,
+                                      tracker, detect_every)
+
+        # The detector times inference and postprocess into the run's
+        # profiler too, and gets its own back when the run ends
+        if profiler is not None:
+            previous_profiler, detector.profiler = detector.profiler, profiler
+
+        completed = False
+        frame_count = 0
+        try:
+            for result in results:
+                yield result
+                frame_count += 1
+            completed = True
+        finally:
+            # Stops and joins the pipeline threads before their capture and
+            # writer go away, when the consumer stops early
+            results.close()
+            if profiler is not None:
+                detector.profiler = previous_profiler
+            self.cap.release()
+            self.video_source.release()
             if writer:
-                writer.write(annotated_frame)
+                writer.release()
+            # A run cut short (by the user or the consumer) only saw part of the video
+            if recorder is not None and completed and not self.interrupted:
+                recorder.commit(frame_count)
+
+        print("[INFO] Video processing complete.")
+
+    def run_serial(self, detector, writer, distance_calculator, display, batch_size=1, annotate=True,
+                   tracker=None, detect_every=1):
+        frame_count = 0
+        stopped = False
 
-            if display:
-                cv2.imshow("Live Detection", annotated_frame)
-            if cv2.waitKey(25) & 0xFF == ord('q'):
-                print("[INFO] Stream stopped by user.")
+        while not stopped:
+            frames = self.read_frames(batch_size)
+            if not frames:
                 break
 
-            all_detections.append({
-                "frame": frame_count,
-                "detections": detections
-            })
+            frame_indices = range(frame_count, frame_count + len(frames))
+            results = self.detect_frames(detector, frames, frame_indices, tracker, detect_every)
+            for frame, (detections, from_detector) in zip(frames, results):
+                annotated_frame, distances = self.annotate_frame(detector, distance_calculator, frame, detections,
+                                                                 annotate, calibrate=from_detector)
 
-        self.cap.release()
-        if writer:
-            writer.release()
+                if writer:
+                    with self.profiler.stage("encode"):
+                        writer.write(annotated_frame)
 
-        print("[INFO] Video processing complete.")
-        return all_detections
+                yield frame_count, detections, distances
+                frame_count += 1
+
+                if display and not self.show_frame(annotated_frame):
+                    self.interrupted = stopped = True
+                    break
+
+    # ----------Pipelined processing---------
+    # decode -> infer -> annotate -> encode, one thread per stage joined by
+    # bounded queues. A single worker per stage keeps frames in order and a
+    # full queue blocks its producer, so a slow stage throttles the others.
+    # Annotation (boxes and distances) and display run on the calling thread:
+    # drawing stays off the inference worker, and HighGUI windows must be
+    # driven from the main thread. The inference stage
+    # batches whatever frames are already queued, up to batch_size, so it
+    # never waits on the decoder just to fill a batch.
+
+    def run_pipeline(self, detector, writer, distance_calculator, display, queue_size, batch_size=1, annotate=True,
+                     tracker=None, detect_every=1):
+        # stop tears every stage down on an error; stop_input only halts
+        # decode and inference, so frames already shown still get encoded
+        stop = threading.Event()
+        stop_input = threading.Event()
+        errors = []
+        decoded = queue.Queue(maxsize=queue_size)
+        detected = queue.Queue(maxsize=queue_size)
+        annotated = queue.Queue(maxsize=queue_size)
+
+        threads = [
+            threading.Thread(target=self._run_stage, name="decoder", daemon=True,
+                             args=(self._decode_stage, errors, stop, stop_input, None, decoded)),
+            threading.Thread(target=self._run_stage, name="inference", daemon=True,
+                             args=(self._inference_stage, errors, stop, stop_input, decoded, detected, detector,
+                                   batch_size, tracker, detect_every)),
+            threading.Thread(target=self._run_stage, name="encoder", daemon=True,
+                             args=(self._encode_stage, errors, stop, stop, annotated, None, writer)),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(detected, stop)
+                if item is _END_OF_STREAM:
+                    break
+                frame_count, frame, detections, from_detector = item
+                annotated_frame, distances = self.annotate_frame(detector, distance_calculator, frame, detections,
+                                                                 annotate, calibrate=from_detector)
+
+                if not self._put(annotated, annotated_frame, stop):
+                    break
+
+                yield frame_count, detections, distances
+
+                if display and not self.show_frame(annotated_frame):
+                    self.interrupted = True
+                    break
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            stop_input.set()
+            # The encoder drains what is already queued before it sees this
+            self._put(annotated, _END_OF_STREAM, stop)
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _run_stage(stage, errors, stop, halt, in_queue, out_queue, *args):
+        # The stage runs until halt is set; a failure sets stop for everyone
+        try:
+            stage(halt, in_queue, out_queue, *args)
+        except Exception as e:
+            print(f"[ERROR] {threading.current_thread().name} stage failed: {e}")
+            errors.append(e)
+            stop.set()
+            halt.set()
+        finally:
+            if out_queue is not None:
+                VideoProcessor._put(out_queue, _END_OF_STREAM, halt)
+
+    @staticmethod
+    def _put(q, item, stop):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _get(q, stop):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END_OF_STREAM
+
+    def _decode_stage(self, stop, in_queue, out_queue):
+        frame_count = 0
+        while not stop.is_set():
+            ret, frame = self.read_frame()
+            if not ret:
+                break
+            if not self._put(out_queue, (frame_count, frame), stop):
+                break
+            frame_count += 1
+
+    def _inference_stage(self, stop, in_queue, out_queue, detector, batch_size, tracker, detect_every):
+        end_of_stream = False
+        while not end_of_stream:
+            item = self._get(in_queue, stop)
+            if item is _END_OF_STREAM:
+                break
+            batch = [item]
+            while len(batch) < batch_size:
+                try:
+                    item = in_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _END_OF_STREAM:
+                    end_of_stream = True
+                    break
+                batch.append(item)
+
+            frame_indices = [frame_count for frame_count, _ in batch]
+            results = self.detect_frames(detector, [frame for _, frame in batch], frame_indices, tracker,
+                                         detect_every)
+            for (frame_count, frame), (detections, from_detector) in zip(batch, results):
+                if not self._put(out_queue, (frame_count, frame, detections, from_detector), stop):
+                    return
+
+    def _encode_stage(self, stop, in_queue, out_queue, writer):
+        while True:
+            item = self._get(in_queue, stop)
+            if item is _END_OF_STREAM:
+                break
+            if writer:
+                with self.profiler.stage("encode"):
+                    writer.write(item)
@@ -1,14 +1,22 @@
 from abc import ABC, abstractmethod
+import atexit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from video_cache import VideoCache, CHUNK_SIZE
 import os
-import uuid
+import re
+import threading
+import urllib.request
 import yt_dlp
-import tempfile
 
 class VideoSourceInterface(ABC):
     @abstractmethod
     def get_video_source(self):
         pass
 
+    def release(self):
+        # Called once the capture on get_video_source() has been released
+        pass
+
 class WebcamSource(VideoSourceInterface):
     def get_video_source(self):
         return 0
@@ -22,25 +30,254 @@ class LocalFileSource(VideoSourceInterface):
             raise FileNotFoundError(f"File {self.file_path} not found")
         return self.file_path
     
+class GrowingFileRelay:
+    # Serves a file that is still being downloaded over loopback HTTP. A read
+    # past the downloaded end waits for more bytes instead of returning EOF,
+    # which is what FFmpeg would hit reading the .part file by path. Ranges
+    # are honoured when the upstream size is known, so the capture can seek.
+    def __init__(self, path):
+        self.path = path
+        self.size = None
+        self.available = 0
+        self.started = False
+        self.done = False
+        # Reads in flight; the file is only moved or deleted when this is 0
+        self.readers = 0
+        self.cond = threading.Condition()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.make_handler())
+        self.server.daemon_threads = True
+        self.closed = False
+        threading.Thread(target=self.server.serve_forever, name="relay", daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/video.mp4"
+
+    def make_handler(self):
+        relay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                relay.serve(self)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self, size):
+        with self.cond:
+            self.size = size
+            self.started = True
+            self.cond.notify_all()
+
+    def grow(self, count):
+        with self.cond:
+            self.available += count
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.done = True
+            self.cond.notify_all()
+
+    def close(self):
+        # Stops listening; requests still being served end with the download
+        if self.closed:
+            return
+        self.closed = True
+        self.server.shutdown()
+        self.server.server_close()
+
+    def replace_file(self, move):
+        # move(path) returns the file's new path; no read has it open meanwhile
+        with self.cond:
+            self.cond.wait_for(lambda: self.readers == 0)
+            self.path = move(self.path)
+
+    def discard(self):
+        # Deletes the partial file; readers see the stream end
+        with self.cond:
+            self.cond.wait_for(lambda: self.readers == 0)
+            if os.path.isfile(self.path):
+                os.remove(self.path)
+            self.available = 0
+            self.done = True
+            self.cond.notify_all()
+
+    def read(self, position):
+        # None once the download is over and everything has been served.
+        # The file I/O runs outside the lock so it never holds up grow() or
+        # the other readers.
+        with self.cond:
+            self.cond.wait_for(lambda: self.available > position or self.done)
+            if self.available <= position:
+                return None
+            size = min(CHUNK_SIZE, self.available - position)
+            path = self.path
+            self.readers += 1
+        try:
+            with open(path, "rb") as f:
+                f.seek(position)
+                return f.read(size)
+        finally:
+            with self.cond:
+                self.readers -= 1
+                self.cond.notify_all()
+
+    def serve(self, handler):
+        with self.cond:
+            self.cond.wait_for(lambda: self.started or self.done)
+        start = 0
+        match = re.match(r"bytes=(\d+)-", handler.headers.get("Range", ""))
+        if match and self.size is not None:
+            start = int(match.group(1))
+            if start >= self.size:
+                handler.send_response(416)
+                handler.send_header("Content-Range", f"bytes */{self.size}")
+                handler.end_headers()
+                return
+            handler.send_response(206)
+            handler.send_header("Content-Range", f"bytes {start}-{self.size - 1}/{self.size}")
+        else:
+            handler.send_response(200)
+        if self.size is not None:
+            handler.send_header("Accept-Ranges", "bytes")
+            handler.send_header("Content-Length", str(self.size - start))
+        handler.send_header("Content-Type", "video/mp4")
+        handler.end_headers()
+
+        position = start
+        try:
+            while True:
+                chunk = self.read(position)
+                if chunk is None:
+                    break
+                handler.wfile.write(chunk)
+                position += len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # FFmpeg drops the connection whenever it seeks
+            pass
+
+class StreamingURLSource(VideoSourceInterface):
+    # The URL is fetched exactly once, into a .part file in the cache, and
+    # cv2.VideoCapture reads that file while it grows through a
+    # GrowingFileRelay. The first frame arrives long before the download is
+    # done, and the finished file becomes the cache entry for the next run.
+    # A download still running when the process exits (the user quit early)
+    # is cancelled and its .part file deleted; call wait_for_download() to
+    # fill the cache regardless.
+    def __init__(self, url, cache=None, cache_key=None):
+        self.url = url
+        self.cache = cache if cache is not None else VideoCache()
+        self.cache_key = cache_key or VideoCache.key_for(url)
+        self.download_thread = None
+        self.stop_download = threading.Event()
+        self.relay = None
+
+    def get_video_source(self):
+        cached_path = self.cache.lookup(self.cache_key)
+        if cached_path:
+            print(f"[INFO] Using cached video: {cached_path}")
+            return cached_path
+
+        part_path = self.cache.new_part_path()
+        self.relay = GrowingFileRelay(part_path)
+        self.download_thread = threading.Thread(target=self.download_to_cache, args=(part_path,),
+                                                name="download", daemon=True)
+        self.download_thread.start()
+        atexit.register(self.cancel_download)
+        print(f"[INFO] Streaming video from: {self.url}")
+        return self.relay.url
+
+    def wait_for_download(self, timeout=None):
+        if self.download_thread is not None:
+            self.download_thread.join(timeout)
+
+    def cancel_download(self, timeout=5.0):
+        # Gives the download thread a moment to notice and delete its .part
+        # file; anything left behind is swept up by the cache's stale check
+        if self.download_thread is None or not self.download_thread.is_alive():
+            return
+        print("[INFO] Cancelling unfinished download")
+        self.stop_download.set()
+        self.download_thread.join(timeout)
+
+    def release(self):
+        # The capture is done with the relay; the download itself carries on
+        # to fill the cache unless the process exits first
+        if self.relay is not None:
+            self.relay.close()
+
+    def download_to_cache(self, part_path):
+        relay = self.relay
+        cancelled = False
+        try:
+            with urllib.request.urlopen(self.url) as response, open(part_path, "wb") as f:
+                length = response.headers.get("Content-Length")
+                relay.start(int(length) if length else None)
+                for chunk in iter(lambda: response.read1(CHUNK_SIZE), b""):
+                    if self.stop_download.is_set():
+                        cancelled = True
+                        break
+                    f.write(chunk)
+                    f.flush()
+                    relay.grow(len(chunk))
+            if cancelled:
+                relay.discard()
+                return
+            relay.replace_file(lambda path: self.cache.store(self.cache_key, path))
+        except Exception as e:
+            print(f"[ERROR] Download failed: {e}")
+            relay.discard()
+        finally:
+            relay.finish()
+
 class YouTubeSource(VideoSourceInterface):
-    def __init__(self, yt_url):
+    def __init__(self, yt_url, streaming=False, cache=None):
         self.yt_url = yt_url
+        self.streaming = streaming
+        self.cache = cache if cache is not None else VideoCache()
+        self.ydl_format = 'best[ext=mp4]'
+        self.stream_source = None
 
-    def get_video_source(self):
-       temp_filename = f"youtube_video_{uuid.uuid4().hex}.mp4"
-       temp_path = os.path.join(tempfile.gettempdir(), temp_filename)
-       ydl_opts = {
-            'format': 'best[ext=mp4]',
-            'outtmpl': temp_path,
+    def release(self):
+        if self.stream_source is not None:
+            self.stream_source.release()
+
+    def cache_key(self):
+        # From the URL and format alone, so a cache hit needs no network call
+        return VideoCache.key_for(f"youtube:{self.yt_url}:{self.ydl_format}")
+
+    def resolve(self):
+        ydl_opts = {
+            'format': self.ydl_format,
             'quiet': True,
         }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(self.yt_url, download=False)
+        return info['url']
+
+    def get_video_source(self):
+        try:
+            cache_key = self.cache_key()
+            cached_path = self.cache.lookup(cache_key)
+            if cached_path:
+                print(f"[INFO] Using cached video: {cached_path}")
+                return cached_path
+
+            if self.streaming:
+                self.stream_source = StreamingURLSource(self.resolve(), self.cache, cache_key)
+                return self.stream_source.get_video_source()
 
-       try:
+            part_path = self.cache.new_part_path()
+            ydl_opts = {
+                'format': self.ydl_format,
+                'outtmpl': part_path,
+                'quiet': True,
+            }
             print(f"[INFO] Downloading video using yt-dlp: {self.yt_url}")
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 ydl.download([self.yt_url])
-            return temp_path
+            return self.cache.store(cache_key, part_path)
 
-       except Exception as e:
+        except Exception as e:
             print(f"[ERROR] yt-dlp failed: {e}")
             raise